@@ -1,4 +1,5 @@
 import argparse
+import json
 from fetal_brain_qc.definitions import MASK_PATTERN, BRAIN_CKPT
 
 
@@ -138,3 +139,28 @@ def build_reports_parser(parser):
         default=42,
         help="Seed for the random number generator.",
     )
+
+
+def add_manifest_argument(parser):
+    parser.add_argument(
+        "--manifest",
+        help=(
+            "JSON file containing a list of jobs, each given as the list of "
+            "arguments of the pipeline. The jobs are run one after the "
+            "other, and all other arguments are ignored."
+        ),
+        default=None,
+    )
+
+
+def get_manifest_jobs(argv=None):
+    """If `--manifest` is given in `argv`, returns the list of jobs (lists of
+    arguments) that it contains. Returns None otherwise.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    add_manifest_argument(parser)
+    args, _ = parser.parse_known_args(argv)
+    if args.manifest is None:
+        return None
+    with open(args.manifest, "r") as f:
+        return json.load(f)
@@ -18,6 +18,36 @@ using FetMRQC
 """
 
 
+def write_csv_row(csv_path, row, fieldnames=None):
+    """Write the dict `row` to `csv_path` and return the columns of the file.
+    If `fieldnames` is None, a new file is created with the columns of `row`.
+    Otherwise, `fieldnames` are the columns of the existing file and the row
+    is appended to it. If the row has columns that are not yet in the file,
+    the file is rewritten once with the new columns.
+    """
+    import csv
+    import pandas as pd
+
+    if fieldnames is None:
+        fieldnames = list(row.keys())
+        with open(csv_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerow(row)
+    elif not set(row.keys()) <= set(fieldnames):
+        # The previous rows are read as strings, to be written back as
+        # they were (e.g. without converting a session "01" to 1).
+        df = pd.concat(
+            [pd.read_csv(csv_path, dtype=str), pd.DataFrame([row])]
+        )
+        df.to_csv(csv_path, index=False)
+        fieldnames = list(df.columns)
+    else:
+        with open(csv_path, "a", newline="") as f:
+            csv.DictWriter(f, fieldnames=fieldnames).writerow(row)
+    return fieldnames
+
+
 def main(argv=None):
     import os
     import numpy as np
@@ -95,8 +125,8 @@ def main(argv=None):
         action=argparse.BooleanOptionalAction,
         default=True,
         help=(
-            "Whether QC run should re-use existing results if a metrics.csv file at "
-            "`out_path`/metrics.csv."
+            "Whether QC run should re-use existing results if a file is found at "
+            "`out_csv`."
         ),
     )
 
@@ -142,17 +172,23 @@ def main(argv=None):
     df_base = pd.DataFrame.from_dict(bids_list)
     df_base = df_base.set_index("name")
     os.makedirs(Path(args.out_csv).parent, exist_ok=True)
+    # Columns of out_csv, None until its header has been written.
+    fieldnames = None
 
     # If a file is found, continue.
     if os.path.isfile(args.out_csv) and args.continue_run:
         print("\tCONTINUING FROM A PREVIOUSLY FOUND RUN.")
-        df = pd.read_csv(args.out_csv).set_index("name")
+        df = pd.read_csv(args.out_csv)
+        # Rows are appended following the column order of the file.
+        fieldnames = list(df.columns)
+        df = df.set_index("name")
         metrics_dict = df.to_dict(orient="index")
         # Remove duplicate keys
         metrics_dict = {
             k: {k2: v2 for k2, v2 in v.items() if k2 not in df_base.columns}
             for k, v in metrics_dict.items()
         }
+
     if args.use_prob_seg:
         seg_key = "seg_proba"
     else:
@@ -160,7 +196,7 @@ def main(argv=None):
     for run in bids_list:
         # Loading data
         name = Path(run["im"]).name
-        if run["name"] in metrics_dict.keys():
+        if run["name"] in metrics_dict:
             print(f"Subject {name} found in {args.out_csv}.")
             continue
 
@@ -182,10 +218,10 @@ def main(argv=None):
                     run["im"], run["mask"], run[seg_key]
                 )
                 sys.stdout = stdo
-        df = pd.DataFrame.from_dict(metrics_dict, orient="index")
-        df = pd.concat([df_base, df], axis=1, join="inner")
-        df.index.name = "name"
-        df.to_csv(args.out_csv)
+        # Only the new row is appended to the output file.
+        fieldnames = write_csv_row(
+            args.out_csv, {**run, **metrics_dict[run["name"]]}, fieldnames
+        )
     return 0
 
 
@@ -98,7 +98,11 @@ def compute_segmentations(
         )
         if cropped is not None:
             cropped = Path(cropped)
-            # Rename the cropped images to the nnUNet format
+            # Rename the cropped images to the nnUNet format. They are kept
+            # as .nii.gz: nnUNet only lists inputs with the file ending of
+            # the trained dataset, and the cropped images are kept as
+            # outputs. nibabel already writes gzip files at the fastest
+            # compression level.
             renamed = cropped.parent / (
                 cropped.stem.split(".")[0] + "_0000.nii.gz"
             )
@@ -116,7 +120,11 @@ def compute_segmentations(
             list_seg.append((row["im"], row["mask"]))
         else:
             list_done.append(out)
-    Parallel(n_jobs=4)(delayed(mask_im)(im, mask) for im, mask in list_seg)
+    # Loading, cropping and saving are dominated by I/O and NumPy operations
+    # which release the GIL: threads avoid spawning and pickling to processes.
+    Parallel(n_jobs=-1, backend="threading")(
+        delayed(mask_im)(im, mask) for im, mask in list_seg
+    )
 
     print(" done.")
 
@@ -80,25 +80,29 @@ def load_model(args, task):
             iqms = METRICS + METRICS_SEG
         else:
             iqms = FETMRQC20
-        return ckpt_path, iqms
+    return joblib.load(ckpt_path), iqms
 
 
-def run_model(bids_df, ckpt_path, iqms, task, args):
+def run_model(bids_df, model, iqms, task):
     """
-    Run the regression/classification model on the data in the bids_df.
-
+    Run the regression/classification model on the IQMs in bids_df
+    and return the predictions.
     """
-    is20 = "20" if args.fetmrqc20 else ""
-    print_title(f"Running FetMRQC{is20} inference ({task}).")
-    model = joblib.load(ckpt_path)
-    out_path = Path(args.out_csv)
-    os.makedirs(out_path.parent, exist_ok=True)
     test_x = bids_df[iqms]
+    # The FetMRQC pipelines operate on DataFrames (column selection, group
+    # scaling and dtype restoration), so the features are kept as such, but
+    # mis-typed IQM columns (object, or string with pandas>=3) are converted
+    # to numbers once here.
+    non_numeric = test_x.select_dtypes(exclude=["number", "bool"]).columns
+    if len(non_numeric) > 0:
+        test_x = test_x.assign(
+            **{c: pd.to_numeric(test_x[c]).astype(float) for c in non_numeric}
+        )
     test_y = model.predict(test_x)
     if task == "classification":
-        bids_df.insert(0, f"fetmrqc_{task}", test_y.astype(int))
+        return test_y.astype(int)
     else:
-        bids_df.insert(0, f"fetmrqc_{task}", test_y.round(3))
+        return test_y.round(3)
 
 
 def main():
@@ -154,19 +158,30 @@ def main():
     )
 
     args = parser.parse_args()
-    bids_df = pd.read_csv(args.iqms_csv)
 
     assert (
         args.classification or args.regression
     ), "You did not specify any option for the task. Please specify either classification and/or regression."
 
+    # Load the models first, so that the IQMs csv is only parsed once
+    # they are available.
+    models = {}
     if args.classification:
-        ckpt_path, iqms = load_model(args, "classification")
-        run_model(bids_df, ckpt_path, iqms, "classification", args)
+        models["classification"] = load_model(args, "classification")
     if args.regression:
-        ckpt_path, iqms = load_model(args, "regression")
-        run_model(bids_df, ckpt_path, iqms, "regression", args)
+        models["regression"] = load_model(args, "regression")
 
+    # The IQMs csv is parsed once, and the predictions are saved along
+    # all of its columns.
+    bids_df = pd.read_csv(args.iqms_csv)
+    for task, (model, iqms) in models.items():
+        bids_df[f"fetmrqc_{task}"] = run_model(bids_df, model, iqms, task)
+
+    # Move the predictions to the first columns, once, before saving.
+    pred_cols = [f"fetmrqc_{task}" for task in reversed(models)]
+    bids_df = bids_df[
+        pred_cols + [c for c in bids_df.columns if c not in pred_cols]
+    ]
     out_path = Path(args.out_csv)
     os.makedirs(out_path.parent, exist_ok=True)
     bids_df.to_csv(out_path, index=False)
@@ -75,7 +75,7 @@ def main():
     for run in bids_list:
         # Loading data
         name = Path(run["im"]).name
-        if run["name"] in metrics_dict.keys():
+        if run["name"] in metrics_dict:
             print(f"Subject {name} found in metrics.csv.")
             continue
         print(f"Processing subject {name}")
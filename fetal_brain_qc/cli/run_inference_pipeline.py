@@ -25,7 +25,11 @@ from fetal_brain_qc.definitions import MASK_PATTERN, BRAIN_CKPT
 from fetal_brain_qc.qc_evaluation import METRICS, METRICS_SEG
 from fetal_brain_qc.definitions import FETMRQC20, FETMRQC20_METRICS
 import json
-from fetal_brain_qc.cli.build_run_parsers import build_inference_parser
+from fetal_brain_qc.cli.build_run_parsers import (
+    build_inference_parser,
+    add_manifest_argument,
+    get_manifest_jobs,
+)
 
 IQMS_NO_NAN = [iqm for iqm in METRICS + METRICS_SEG if "_nan" not in iqm]
 
@@ -36,7 +40,16 @@ def run_cmd(cmd):
         raise RuntimeError(f"Command failed: {cmd}")
 
 
-def main():
+def main(argv=None):
+    # Running the jobs of a manifest one after the other. Each step of the
+    # pipeline is still run as a separate command for every job, so this
+    # only avoids starting a new container per job.
+    jobs = get_manifest_jobs(argv)
+    if jobs is not None:
+        for job in jobs:
+            main(job)
+        return
+
     parser = argparse.ArgumentParser(
         description=(
             "Given a `bids_dir`, lists the LR series in "
@@ -48,8 +61,9 @@ def main():
         formatter_class=argparse.ArgumentDefaultsHelpFormatter,
     )
     build_inference_parser(parser)
+    add_manifest_argument(parser)
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     # Running brain extraction
     cmd = (
@@ -20,10 +20,23 @@ Given a BIDS dataset, generates a report for each subject/session/run.
 
 import argparse
 import os
-from fetal_brain_qc.cli.build_run_parsers import build_reports_parser
+from fetal_brain_qc.cli.build_run_parsers import (
+    build_reports_parser,
+    add_manifest_argument,
+    get_manifest_jobs,
+)
 
 
-def main():
+def main(argv=None):
+    # Running the jobs of a manifest one after the other. Each step of the
+    # pipeline is still run as a separate command for every job, so this
+    # only avoids starting a new container per job.
+    jobs = get_manifest_jobs(argv)
+    if jobs is not None:
+        for job in jobs:
+            main(job)
+        return
+
     parser = argparse.ArgumentParser(
         description=(
             "Given a `bids_dir`, lists the LR series in "
@@ -34,7 +47,8 @@ def main():
         formatter_class=argparse.ArgumentDefaultsHelpFormatter,
     )
     build_reports_parser(parser)
-    args = parser.parse_args()
+    add_manifest_argument(parser)
+    args = parser.parse_args(argv)
     reports_dir = (
         os.path.join(args.out_dir, "derivatives/reports")
         if args.reports_dir is None
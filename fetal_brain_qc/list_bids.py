@@ -94,6 +94,21 @@ def list_bids(
             writer.writerow(data)
 
 
+def _file_exists(path, dir_cache):
+    """Check whether the file `path` exists by looking it up in a listing
+    of its parent directory. Each directory is listed once with os.scandir
+    and cached in `dir_cache`, instead of calling stat on every candidate.
+    """
+    parent, name = os.path.split(path)
+    if parent not in dir_cache:
+        try:
+            with os.scandir(parent or ".") as it:
+                dir_cache[parent] = {e.name for e in it if e.is_file()}
+        except (FileNotFoundError, NotADirectoryError):
+            dir_cache[parent] = set()
+    return name in dir_cache[parent]
+
+
 def list_masks(bids_layout, mask_pattern_list, suffix="T2w"):
     """Given a BIDSLayout and a list of mask_patterns,
     tries to find the masks that exist for each (subject, session, run)
@@ -104,13 +119,14 @@ def list_masks(bids_layout, mask_pattern_list, suffix="T2w"):
     import pdb
 
     file_list = []
+    dir_cache = {}
     for sub, ses, run, out in iter_bids(bids_layout, suffix=suffix):
         paths = [
             fill_pattern(bids_layout, sub, ses, run, p)
             for p in mask_pattern_list
         ]
         for i, f in enumerate(paths):
-            if os.path.exists(f):
+            if _file_exists(f, dir_cache):
                 fname = Path(out).name.replace(".nii.gz", "")
                 file_list.append(
                     {
@@ -16,6 +16,7 @@
 # limitations under the License.
 import numpy as np
 import skimage
+from scipy.special import xlogy
 
 
 def normalized_cross_correlation(x, x_ref):
@@ -37,12 +38,47 @@ def normalized_cross_correlation(x, x_ref):
     if x.shape != x_ref.shape:
         raise ValueError("Input data shapes do not match")
 
-    ncc = np.sum((x - x.mean()) * (x_ref - x_ref.mean()))
-    ncc /= float(x.size * x.std(ddof=1) * x_ref.std(ddof=1))
+    # The (co)variances are computed from the centered data: expanding
+    # them into raw moments loses all precision for nearly constant inputs.
+    # Dot products avoid allocating the centered products.
+    xc = np.asarray(x, dtype=np.float64).ravel()
+    rc = np.asarray(x_ref, dtype=np.float64).ravel()
+    xc = xc - xc.mean()
+    rc = rc - rc.mean()
+    n = xc.size
+    # Normalization by n * std(x) * std(x_ref) with ddof=1.
+    ncc = float((xc @ rc) * (n - 1) / (n * np.sqrt((xc @ xc) * (rc @ rc))))
 
     return ncc
 
 
+def _entropy(prob):
+    """Entropy of a (possibly multi-dimensional) probability array,
+    where empty bins contribute 0 (xlogy(0, 0) = 0).
+    """
+    return float(-xlogy(prob, prob).sum())
+
+
+def _joint_entropies(x, x_ref, bins=100):
+    """Compute H(X), H(Y) and H(X,Y) from a single joint histogram.
+    The marginal histograms are obtained by summing the joint histogram
+    along each axis. For float64 inputs, they match the histograms that
+    `shannon_entropy` would compute independently, as the bin edges span
+    the range of each input. For other types, np.histogram computes its
+    edges in the input type while np.histogram2d uses float64 edges, so
+    values close to an edge may fall in a different bin.
+    """
+    hist, x_edges, y_edges = np.histogram2d(
+        x.ravel(), x_ref.ravel(), bins=bins
+    )
+    prob = hist / float(np.sum(hist))
+    return (
+        _entropy(prob.sum(axis=1)),
+        _entropy(prob.sum(axis=0)),
+        _entropy(prob),
+    )
+
+
 def shannon_entropy(x, bins=100):
     """
     Compute Shannon entropy
@@ -67,9 +103,7 @@ def shannon_entropy(x, bins=100):
     # Compute probabilities
     prob = hist / float(np.sum(hist))
 
-    entropy = -sum([p * np.log(p) for p in prob.flatten() if p != 0])
-
-    return entropy
+    return _entropy(prob)
 
 
 def joint_entropy(x, x_ref, bins=100):
@@ -96,14 +130,13 @@ def joint_entropy(x, x_ref, bins=100):
     """
 
     hist, x_edges, y_edges = np.histogram2d(
-        x.flatten(), x_ref.flatten(), bins=bins
+        x.ravel(), x_ref.ravel(), bins=bins
     )
 
     # Compute probabilities
     prob = hist / float(np.sum(hist))
 
-    jentropy = -sum([p * np.log(p) for p in prob.flatten() if p != 0])
-    return jentropy
+    return _entropy(prob)
 
 
 def mutual_information(x, x_ref, bins=100):
@@ -131,10 +164,8 @@ def mutual_information(x, x_ref, bins=100):
 
     Original code from https://github.com/gift-surg/NSoL/blob/master/nsol/similarity_measures.py
     """
-    mi = shannon_entropy(x, bins=bins)
-    mi += shannon_entropy(x_ref, bins=bins)
-    mi -= joint_entropy(x, x_ref, bins=bins)
-    return mi
+    h_x, h_ref, h_joint = _joint_entropies(x, x_ref, bins=bins)
+    return h_x + h_ref - h_joint
 
 
 def normalized_mutual_information(x, x_ref, bins=100):
@@ -159,17 +190,15 @@ def normalized_mutual_information(x, x_ref, bins=100):
 
     Original code from https://github.com/gift-surg/NSoL/blob/master/nsol/similarity_measures.py
     """
-    nmi = shannon_entropy(x, bins=bins)
-    nmi += shannon_entropy(x_ref, bins=bins)
-    nmi /= joint_entropy(x, x_ref, bins=bins)
-    return nmi
+    h_x, h_ref, h_joint = _joint_entropies(x, x_ref, bins=bins)
+    return (h_x + h_ref) / h_joint
 
 
 def psnr(x, x_ref, datarange=None):
     if not datarange:
         datarange = int(np.amax(x_ref) - min(np.amin(x), np.amin(x_ref)))
 
-    if sum(abs(x - x_ref)) < 1e-13:
+    if np.array_equal(x, x_ref):
         # Avoiding to compute the psnr on exactly the same slices.
         return np.nan
     psnr = skimage.metrics.peak_signal_noise_ratio(
@@ -178,20 +207,40 @@ def psnr(x, x_ref, datarange=None):
     return psnr
 
 
+def _as_flat_float64(x, x_ref):
+    """Check that x and x_ref have the same shape and return them as
+    flattened float64 arrays, for the error metrics below.
+    """
+    if x.shape != x_ref.shape:
+        raise ValueError("Input data shapes do not match")
+    return (
+        np.asarray(x, dtype=np.float64).ravel(),
+        np.asarray(x_ref, dtype=np.float64).ravel(),
+    )
+
+
 def nrmse(x, x_ref):
-    return skimage.metrics.normalized_root_mse(x, x_ref)
+    # Normalized by the (euclidean) norm of x, as in
+    # skimage.metrics.normalized_root_mse.
+    x, x_ref = _as_flat_float64(x, x_ref)
+    d = x - x_ref
+    return np.sqrt(np.dot(d, d) / np.dot(x, x))
 
 
 def rmse(x, x_ref):
-    return np.sqrt(skimage.metrics.mean_squared_error(x, x_ref))
+    x, x_ref = _as_flat_float64(x, x_ref)
+    d = x - x_ref
+    return np.sqrt(np.dot(d, d) / d.size)
 
 
 def mae(x, x_ref):
-    return np.mean(abs(x - x_ref))
+    x, x_ref = _as_flat_float64(x, x_ref)
+    return np.abs(x - x_ref).mean()
 
 
 def nmae(x, x_ref):
-    return mae(x, x_ref) / np.mean(np.abs(x_ref))
+    x, x_ref = _as_flat_float64(x, x_ref)
+    return np.abs(x - x_ref).sum() / np.abs(x_ref).sum()
 
 
 def ssim(x, x_ref, mask=None, datarange=None):
@@ -214,6 +263,7 @@ def ssim(x, x_ref, mask=None, datarange=None):
         if mask is None:
             return ssim[0]
         else:
-            return ssim[1][mask > 0].mean()
+            mask = mask > 0
+            return ssim[1].sum(where=mask) / np.count_nonzero(mask)
 
     return pick_ssim(ssim, mask)
@@ -314,9 +314,11 @@ def plot_mosaic_sr(
 
     im = ni.load(imp)
     if maskp == "":
-        mask = ni.load(imp)
+        # Threshold the image already loaded, from its on-disk data.
         mask = ni.Nifti1Image(
-            (mask.get_fdata() > 0).astype(int), mask.affine, mask.header
+            (np.asanyarray(im.dataobj) > 0).astype(np.uint8),
+            im.affine,
+            im.header,
         )
     else:
         mask = ni.load(maskp)
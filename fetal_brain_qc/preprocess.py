@@ -15,9 +15,36 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import os
+import numpy as np
 import SimpleITK as sitk
 import nibabel as ni
-from fetal_brain_utils import get_cropped_stack_based_on_mask
+
+
+def get_mask_bounding_box(image_ni, mask_ni, boundary_mm=0):
+    """Returns the bounding box of the non-zero voxels of `mask_ni` as a
+    tuple of slices along the three spatial axes, extended by
+    `boundary_mm` millimeters on each side and limited to the extent of
+    both images. Returns None if the mask is empty.
+
+    As in fetal_brain_utils.get_cropped_stack_based_on_mask, the boundary
+    is converted to voxels using the spacing of `image_ni`.
+    """
+    mask = np.asanyarray(mask_ni.dataobj) != 0
+    if mask.ndim > 3:
+        mask = mask.reshape(mask.shape[:3] + (-1,)).any(axis=-1)
+    if not mask.any():
+        return None
+    spacing = np.array(image_ni.header.get_zooms()[:3], dtype=float)
+    boundary = np.round(boundary_mm / spacing).astype(int)
+    shape = np.minimum(image_ni.shape[:3], mask.shape)
+    bbox = []
+    for axis in range(3):
+        other_axes = tuple(a for a in range(3) if a != axis)
+        idx = np.flatnonzero(mask.any(axis=other_axes))
+        start = max(0, idx[0] - boundary[axis])
+        stop = min(shape[axis], idx[-1] + 1 + boundary[axis])
+        bbox.append(slice(start, stop))
+    return tuple(bbox)
 
 
 def crop_input(
@@ -37,34 +64,25 @@ def crop_input(
 
     im, m = ni.load(file_path), ni.load(mask_path)
 
-    imc = get_cropped_stack_based_on_mask(
-        im,
-        m,
-        boundary_i=boundary_mm,
-        boundary_j=boundary_mm,
-        boundary_k=boundary_mm,
-    )
-
-    maskc = get_cropped_stack_based_on_mask(
-        m,
-        m,
-        boundary_i=boundary_mm,
-        boundary_j=boundary_mm,
-        boundary_k=boundary_mm,
-    )
+    bbox = get_mask_bounding_box(im, m, boundary_mm)
+    # Slicing the proxies only reads the cropped region from the files
+    # (and updates the affines accordingly), in their on-disk data type.
+    if bbox is not None:
+        imc, maskc = im.slicer[bbox], m.slicer[bbox]
     # If the cropping yields an empty image, return None.
-    if imc is None or imc.get_fdata().shape != maskc.get_fdata().shape:
+    if bbox is None or imc.shape != maskc.shape:
         if save_mask:
             return None, None
         else:
             return None
 
+    imc_data = imc.get_fdata(dtype=np.float32)
     if mask_image:
-        imc = ni.Nifti1Image(
-            imc.get_fdata() * maskc.get_fdata(), imc.affine, imc.header
-        )
-    else:
-        imc = ni.Nifti1Image(imc.get_fdata(), imc.affine, imc.header)
+        # In-place boolean masking avoids another full-size temporary.
+        imc_data *= np.asanyarray(maskc.dataobj).astype(bool)
+    imc = ni.Nifti1Image(imc_data, imc.affine, imc.header)
+    # Save the cropped image as float, not in the on-disk type of the input.
+    imc.set_data_dtype(np.float32)
 
     ni.save(imc, output)
     if save_mask:
@@ -83,8 +101,17 @@ def correct_bias_field(
     convergence_threshold,
     spline_order,
     wiener_filter_noise,
+    shrink_factor=2,
+    double_precision=False,
 ):
-    """Bias field correction using sitk."""
+    """Bias field correction using sitk.
+
+    The bias field is estimated in single precision on an image shrunk
+    in-plane by `shrink_factor` (the through-plane resolution of LR stacks
+    is kept), and the full resolution image is then corrected with the
+    B-spline field evaluated at full resolution. Set `shrink_factor=1` and
+    `double_precision=True` to estimate it on the original float64 image.
+    """
 
     bias_field_corrector = sitk.N4BiasFieldCorrectionImageFilter()
 
@@ -99,12 +126,20 @@ def correct_bias_field(
     output = os.path.join(dir_output, os.path.basename(file_path))
     output_bias = os.path.join(dir_output, os.path.basename(bias_path))
 
-    image_sitk = sitk.ReadImage(str(file_path), sitk.sitkFloat64)
+    pixel_type = sitk.sitkFloat64 if double_precision else sitk.sitkFloat32
+    image_sitk = sitk.ReadImage(str(file_path), pixel_type)
+    shrink = [shrink_factor, shrink_factor, 1]
+    image_shrunk = (
+        sitk.Shrink(image_sitk, shrink) if shrink_factor > 1 else image_sitk
+    )
     if use_mask:
         output_mask = os.path.join(dir_output, os.path.basename(mask_path))
         sitk_mask = sitk.ReadImage(str(mask_path), sitk.sitkUInt8)
         sitk_mask.CopyInformation(image_sitk)
-        bias_corr = bias_field_corrector.Execute(image_sitk, sitk_mask)
+        mask_shrunk = (
+            sitk.Shrink(sitk_mask, shrink) if shrink_factor > 1 else sitk_mask
+        )
+        bias_field_corrector.Execute(image_shrunk, mask_shrunk)
 
         stack_corrected_sitk_mask = sitk.Resample(
             sitk_mask,
@@ -116,9 +151,10 @@ def correct_bias_field(
         )
         sitk.WriteImage(stack_corrected_sitk_mask, output_mask)
     else:
-        bias_corr = bias_field_corrector.Execute(image_sitk)
-
-    sitk.WriteImage(bias_corr, output)
+        bias_field_corrector.Execute(image_shrunk)
 
+    # Evaluate the bias field on the full resolution grid.
     bias = bias_field_corrector.GetLogBiasFieldAsImage(image_sitk)
+    bias_corr = image_sitk / sitk.Cast(sitk.Exp(bias), pixel_type)
+    sitk.WriteImage(bias_corr, output)
     sitk.WriteImage(bias, output_bias)
@@ -17,195 +17,385 @@
 It is used to run the main calls to the pipeline, namely:
 1. Reports generation using qc_reports_pipeline
 2. Inference using qc_inference_pipeline
+Both pipelines can also be run on several datasets in a single container
+using the batch command, or in a container kept running between calls
+using --persistent_container.
 """
 import argparse
+import functools
+import importlib
+import json
 import os
-from fetal_brain_qc.cli.build_run_parsers import (
-    build_reports_parser,
-    build_inference_parser,
-)
-from fetal_brain_qc.definitions import BRAIN_CKPT
+import shlex
+import subprocess
+import tempfile
 
 MASK_PATTERN = (
     "sub-{subject}[/ses-{session}][/{datatype}]/sub-{subject}"
     "[_ses-{session}][_acq-{acquisition}][_run-{run}]_{suffix}.nii.gz"
 )
 
+# Functions of fetal_brain_qc.cli.build_run_parsers building the parser
+# of each pipeline. They are imported lazily, see build_pipeline_parser.
+PIPELINE_PARSERS = {
+    "reports": "build_reports_parser",
+    "inference": "build_inference_parser",
+}
+
+# Recommended by NVIDIA
+DOCKER_FLAGS = [
+    "--gpus",
+    "all",
+    "--ipc=host",
+    "--ulimit",
+    "memlock=-1",
+    "--ulimit",
+    "stack=67108864",
+]
+
+
+@functools.lru_cache(maxsize=None)
+def get_fixed_args_defaults() -> dict:
+    """Values allowed for the arguments that cannot be changed through the
+    run_docker script. Built once, as it requires importing fetal_brain_qc.
+    """
+    from fetal_brain_qc.definitions import BRAIN_CKPT
+
+    return {"ckpt_path": [None, BRAIN_CKPT], "custom_model": [None]}
+
 
 def check_fixed_args(fixed_args: dict) -> None:
     """Check that the fixed arguments equal to their defaults.
     This is because not all arguments can be easily changed from the command line without
     being mounted explicitly on the docker.
     """
-    defaults_dict = {"ckpt_path": [None, BRAIN_CKPT], "custom_model": [None]}
-    for k, v in fixed_args.items():
-        if v not in defaults_dict[k]:
-            raise Warning(
-                f"Argument {k} cannot be changed yet using the run_docker script. \n"
-                f"It is fixed to {defaults_dict[k]}, but was passed as {v}. It is ignored."
+    defaults_dict = get_fixed_args_defaults()
+    bad = [(k, v) for k, v in fixed_args.items() if v not in defaults_dict[k]]
+    if bad:
+        raise Warning(
+            "The following arguments cannot be changed yet using the run_docker script:\n"
+            + "\n".join(
+                f"{k} is fixed to {defaults_dict[k]}, but was passed as {v}."
+                for k, v in bad
             )
+        )
 
 
 def check_paths(out_dict: dict, out_dir) -> None:
     """Check that the paths that should be part of the output are given
     as relative paths. Otherwise, they cannot be mounted on the docker.
+    All the offending arguments are reported at once.
     """
-
-    for k, path in out_dict.items():
-        if os.path.isabs(path):
-            raise ValueError(
-                f"Output paths ({out_dict.keys()}) should be relative paths with respect to the out_dir ({out_dir}), but the argument {k} was set to {path}."
-            )
+    bad = [(k, path) for k, path in out_dict.items() if os.path.isabs(path)]
+    if bad:
+        raise ValueError(
+            f"Output paths ({list(out_dict.keys())}) should be relative paths with respect to the out_dir ({out_dir}), but the following were absolute:\n"
+            + "\n".join(f"{k}={path}" for k, path in bad)
+        )
 
 
-def run_reports(args: argparse.Namespace) -> None:
+def prepare_reports(args: argparse.Namespace, root: str = "/data") -> tuple:
     """
-    Run the reports pipeline using the given arguments.
+    Create the output directories of a reports run and return the volumes
+    to be mounted (as (host, docker) pairs) along with the arguments of
+    qc_reports_pipeline, using docker paths rooted at `root`.
     """
-    # Create output directory
     reports_dir = "reports" if args.reports_dir is None else args.reports_dir
-    os.makedirs(args.out_dir, exist_ok=True)
-    os.makedirs(os.path.join(args.out_dir, reports_dir), exist_ok=True)
-    os.makedirs(
-        os.path.dirname(os.path.join(args.out_dir, args.bids_csv)),
-        exist_ok=True,
-    )
-    # Set paths
-    out_docker = "/data/out"
-    reports_dir_docker = os.path.join(out_docker, reports_dir)
-
-    bids_csv = os.path.join(out_docker, args.bids_csv)
     bids_dir = os.path.abspath(args.bids_dir)
     masks_dir = os.path.abspath(args.masks_dir)
     out_dir = os.path.abspath(args.out_dir)
 
-    os.makedirs(masks_dir, exist_ok=True)
-
-    cmd = (
-        f"docker run --rm -it "
-        "--gpus all --ipc=host "  # Recommended by NVIDIA
-        "--ulimit memlock=-1 --ulimit stack=67108864 "  # Recommended by NVIDIA
-        f"-v {bids_dir}:/data/data "
-        f"-v {masks_dir}:/data/masks "
-        f"-v {out_dir}:{out_docker} "
-        f"{args.docker_path} qc_reports_pipeline "
-        f"--bids_dir /data/data "
-        f"--masks_dir /data/masks "
-        f"--reports_dir {reports_dir_docker} "
-        f"--mask_pattern {args.mask_pattern} "
-        f"--bids_csv {bids_csv} "
-        f"--seed {args.seed} "
-    )
-    # Run command
-    print(f"Running command: {cmd}")
-    os.system(cmd)
+    # Create the output directories, once each
+    bids_csv_host = os.path.join(out_dir, args.bids_csv)
+    for d in {
+        out_dir,
+        masks_dir,
+        os.path.join(out_dir, reports_dir),
+        os.path.dirname(bids_csv_host),
+    }:
+        os.makedirs(d, exist_ok=True)
 
+    # Set paths
+    out_docker = f"{root}/out"
+    reports_dir_docker = os.path.join(out_docker, reports_dir)
+    bids_csv = os.path.join(out_docker, args.bids_csv)
 
-def run_inference(args: argparse.Namespace) -> None:
+    volumes = [
+        (bids_dir, f"{root}/data"),
+        (masks_dir, f"{root}/masks"),
+        (out_dir, out_docker),
+    ]
+    pipeline_args = [
+        "--bids_dir",
+        f"{root}/data",
+        "--masks_dir",
+        f"{root}/masks",
+        "--reports_dir",
+        reports_dir_docker,
+        "--mask_pattern",
+        args.mask_pattern,
+        "--bids_csv",
+        bids_csv,
+        "--seed",
+        str(args.seed),
+    ]
+    return volumes, pipeline_args
+
+
+def prepare_inference(args: argparse.Namespace, root: str = "/data") -> tuple:
     """
-    Run the inference pipeline using the given arguments.
+    Create the output directories of an inference run and return the volumes
+    to be mounted (as (host, docker) pairs) along with the arguments of
+    qc_inference_pipeline, using docker paths rooted at `root`.
     """
-    # Create output directory
-    os.makedirs(args.out_dir, exist_ok=True)
-    os.makedirs(
-        os.path.dirname(os.path.join(args.out_dir, args.bids_csv)),
-        exist_ok=True,
-    )
-    os.makedirs(
-        os.path.dirname(os.path.join(args.out_dir, args.iqms_csv)),
-        exist_ok=True,
-    )
-    os.makedirs(
-        os.path.dirname(os.path.join(args.out_dir, args.out_csv)),
-        exist_ok=True,
-    )
-
-    # Set paths
-    out_docker = "/data/out"
-    bids_csv = os.path.join(out_docker, args.bids_csv)
-    iqms_csv = os.path.join(out_docker, args.iqms_csv)
-    out_csv = os.path.join(out_docker, args.out_csv)
     bids_dir = os.path.abspath(args.bids_dir)
     masks_dir = os.path.abspath(args.masks_dir)
     seg_dir = os.path.abspath(args.seg_dir)
     out_dir = os.path.abspath(args.out_dir)
 
-    os.makedirs(masks_dir, exist_ok=True)
-    os.makedirs(seg_dir, exist_ok=True)
+    # Create the output directories, once each
+    csvs_host = [
+        os.path.join(out_dir, csv)
+        for csv in [args.bids_csv, args.iqms_csv, args.out_csv]
+    ]
+    for d in {out_dir, masks_dir, seg_dir} | {
+        os.path.dirname(csv) for csv in csvs_host
+    }:
+        os.makedirs(d, exist_ok=True)
+
+    # Set paths
+    out_docker = f"{root}/out"
+    bids_csv = os.path.join(out_docker, args.bids_csv)
+    iqms_csv = os.path.join(out_docker, args.iqms_csv)
+    out_csv = os.path.join(out_docker, args.out_csv)
 
     fetmrqc20 = (
-        "--fetmrqc20_iqms " if args.fetmrqc20_iqms else "--no-fetmrqc20_iqms "
+        "--fetmrqc20_iqms" if args.fetmrqc20_iqms else "--no-fetmrqc20_iqms"
     )
-    cmd = (
-        f"docker run --rm -it "
-        "--gpus all --gpus all --ipc=host "  # Recommended by NVIDIA
-        "--ulimit memlock=-1 --ulimit stack=67108864 "  # Recommended by NVIDIA
-        f"-v {bids_dir}:/data/data "
-        f"-v {masks_dir}:/data/masks "
-        f"-v {seg_dir}:/data/seg "
-        f"-v {out_dir}:{out_docker} "
-        f"{args.docker_path} qc_inference_pipeline "
-        f"--bids_dir /data/data "
-        f"--masks_dir /data/masks "
-        f"--seg_dir /data/seg "
-        f"--bids_csv {bids_csv} "
-        f"--iqms_csv {iqms_csv} "
-        f"--out_csv {out_csv} "
-        f"{fetmrqc20} "
-        f"--mask_pattern {args.mask_pattern} "
-        f"--seed {args.seed} "
-        f"--device {args.device} "
-    )
-    # Run command
-    print(f"Running command: {cmd}")
-    os.system(cmd)
+    volumes = [
+        (bids_dir, f"{root}/data"),
+        (masks_dir, f"{root}/masks"),
+        (seg_dir, f"{root}/seg"),
+        (out_dir, out_docker),
+    ]
+    pipeline_args = [
+        "--bids_dir",
+        f"{root}/data",
+        "--masks_dir",
+        f"{root}/masks",
+        "--seg_dir",
+        f"{root}/seg",
+        "--bids_csv",
+        bids_csv,
+        "--iqms_csv",
+        iqms_csv,
+        "--out_csv",
+        out_csv,
+        fetmrqc20,
+        "--mask_pattern",
+        args.mask_pattern,
+        "--seed",
+        str(args.seed),
+        "--device",
+        args.device,
+    ]
+    return volumes, pipeline_args
 
 
-def main() -> None:
-    parser = argparse.ArgumentParser(
-        description=(
-            "FetMRQC is a quality control tool for fetal brain MRI. "
-        ),
-        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+@functools.lru_cache(maxsize=None)
+def get_container_status(name: str) -> str:
+    """Return the status of the container `name` (e.g. "running" or
+    "exited"), or None if there is no container of that name. The result is
+    cached for the duration of the run_docker call.
+    """
+    out = subprocess.run(
+        ["docker", "inspect", "-f", "{{.State.Status}}", name],
+        capture_output=True,
+        text=True,
     )
-    subparsers = parser.add_subparsers(
-        help="Pipelines options",
-        dest="command",
+    return out.stdout.strip() if out.returncode == 0 else None
+
+
+def start_persistent_container(
+    name: str, docker_path: str, volumes: list
+) -> None:
+    """
+    Start the container `name` from the image `docker_path` in the
+    background, mounting the (host, docker) pairs listed in `volumes`,
+    so that pipelines can then be run in it using docker exec. If it is
+    already running, check that it has the required volumes mounted, as
+    they cannot be added to a running container. A stopped container of
+    that name is removed first.
+    """
+    status = get_container_status(name)
+    if status == "running":
+        out = subprocess.run(
+            ["docker", "inspect", "-f", "{{json .Mounts}}", name],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        # Host paths are compared once resolved, as they can be given
+        # through symbolic links.
+        mounted = {
+            (os.path.realpath(m["Source"]), m["Destination"])
+            for m in json.loads(out.stdout)
+        }
+        missing = [
+            (host, docker)
+            for host, docker in volumes
+            if (os.path.realpath(host), docker) not in mounted
+        ]
+        if missing:
+            raise ValueError(
+                f"The running container {name} does not mount the following (host, docker) volumes:\n"
+                + "\n".join(f"{host}:{docker}" for host, docker in missing)
+                + f"\nStop it using `run_docker.py stop --persistent_container {name}` first."
+            )
+        return
+    elif status is not None:
+        print(f"Removing the stopped container {name}.")
+        subprocess.run(["docker", "rm", name], check=True)
+
+    mounts = []
+    for host, docker in volumes:
+        mounts += ["-v", f"{os.path.realpath(host)}:{docker}"]
+    argv = (
+        ["docker", "run", "-d", "--rm", "--name", name]
+        + DOCKER_FLAGS
+        + mounts
+        + [docker_path, "sleep", "infinity"]
     )
+    print(f"Starting container: {shlex.join(argv)}")
+    subprocess.run(argv, check=True)
+    get_container_status.cache_clear()
 
-    reports_parser = subparsers.add_parser(
-        "reports",
-        help="Creates reports for manual quality rating, given a BIDS dataset.",
-        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+
+def stop_persistent_container(name: str) -> None:
+    """Stop and remove the persistent container `name`."""
+    status = get_container_status(name)
+    if status is None:
+        print(f"There is no container {name}.")
+        return
+    if status == "running":
+        subprocess.run(["docker", "stop", name], check=True)
+    else:
+        subprocess.run(["docker", "rm", name], check=True)
+    get_container_status.cache_clear()
+
+
+def run_container(
+    docker_path: str,
+    volumes: list,
+    pipeline_argv: list,
+    persistent_container: str = None,
+) -> None:
+    """
+    Run `pipeline_argv` in a new container of the image `docker_path`,
+    mounting the (host, docker) pairs listed in `volumes`.
+    If `persistent_container` is given, the pipeline is instead run using
+    docker exec in the container of that name, which is started first if
+    needed and kept running afterwards.
+    The command is run without a shell, so paths do not need to be quoted.
+    """
+    if persistent_container is not None:
+        start_persistent_container(persistent_container, docker_path, volumes)
+        argv = ["docker", "exec", "-it", persistent_container] + pipeline_argv
+    else:
+        mounts = []
+        for host, docker in volumes:
+            mounts += ["-v", f"{host}:{docker}"]
+        argv = (
+            ["docker", "run", "--rm", "-it"]
+            + DOCKER_FLAGS
+            + mounts
+            + [docker_path]
+            + pipeline_argv
+        )
+    # Run command
+    print(f"Running command: {shlex.join(argv)}")
+    subprocess.run(argv, check=True)
+
+
+def run_reports(args: argparse.Namespace) -> None:
+    """
+    Run the reports pipeline using the given arguments.
+    """
+    volumes, pipeline_args = prepare_reports(args)
+    run_container(
+        args.docker_path,
+        volumes,
+        ["qc_reports_pipeline"] + pipeline_args,
+        args.persistent_container,
     )
-    build_reports_parser(reports_parser)
 
-    inference_parser = subparsers.add_parser(
-        "inference",
-        help="Run FetMRQC inference pipeline on a BIDS dataset",
-        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+
+def run_inference(args: argparse.Namespace) -> None:
+    """
+    Run the inference pipeline using the given arguments.
+    """
+    volumes, pipeline_args = prepare_inference(args)
+    run_container(
+        args.docker_path,
+        volumes,
+        ["qc_inference_pipeline"] + pipeline_args,
+        args.persistent_container,
     )
-    build_inference_parser(inference_parser)
-
-    for p in [reports_parser, inference_parser]:
-        p.add_argument(
-            "--out_dir",
-            help=(
-                "Directory where the results will be stored. This folder is mounted on the docker, "
-                "and all other outputs will be stored relatively to this folder."
-            ),
-            required=True,
-        )
 
-        p.add_argument(
-            "--docker_path",
-            help=("FetMRQC docker image to be used."),
-            type=str,
-            default="thsanchez/fetmrqc:latest",
+
+def run_batch(
+    pipeline: str,
+    jobs: list,
+    docker_path: str,
+    persistent_container: str = None,
+) -> None:
+    """
+    Run the `pipeline` ("reports" or "inference") on a list of jobs, given
+    as parsed arguments, in a single container. The folders of each job are
+    mounted under /data/job<i>, and the arguments of all jobs are passed to
+    the pipeline through a manifest file, so that the container is only
+    started once.
+    """
+    prepare = prepare_reports if pipeline == "reports" else prepare_inference
+    volumes, manifest = [], []
+    for i, job in enumerate(jobs):
+        job_volumes, job_args = prepare(job, root=f"/data/job{i}")
+        volumes += job_volumes
+        manifest.append(job_args)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        manifest_path = os.path.join(tmp_dir, "manifest.json")
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        if persistent_container is not None:
+            # The manifest changes at every call, so it is copied to the
+            # running container rather than mounted.
+            manifest_docker = "/tmp/manifest.json"
+            start_persistent_container(
+                persistent_container, docker_path, volumes
+            )
+            subprocess.run(
+                [
+                    "docker",
+                    "cp",
+                    manifest_path,
+                    f"{persistent_container}:{manifest_docker}",
+                ],
+                check=True,
+            )
+        else:
+            manifest_docker = "/data/manifest.json"
+            volumes.append((manifest_path, manifest_docker))
+        run_container(
+            docker_path,
+            volumes,
+            [f"qc_{pipeline}_pipeline", "--manifest", manifest_docker],
+            persistent_container,
         )
 
-    args = parser.parse_args()
 
+def check_args(args: argparse.Namespace) -> None:
+    """Check the arguments of a reports or inference run."""
     fixed_args = {"ckpt_path": args.ckpt_path}
 
     if args.command == "reports":
@@ -227,6 +417,149 @@ def main() -> None:
     check_fixed_args(fixed_args)
     check_paths(outputs_check, args.out_dir)
 
+
+def build_pipeline_parser(
+    parser: argparse.ArgumentParser, pipeline: str
+) -> None:
+    """Add the arguments of `pipeline` ("reports" or "inference") to `parser`.
+    The parser builders are imported here, so that fetal_brain_qc is only
+    loaded once a pipeline has been chosen, and not e.g. for `--help`.
+    """
+    module = importlib.import_module("fetal_brain_qc.cli.build_run_parsers")
+    getattr(module, PIPELINE_PARSERS[pipeline])(parser)
+    parser.add_argument(
+        "--out_dir",
+        help=(
+            "Directory where the results will be stored. This folder is mounted on the docker, "
+            "and all other outputs will be stored relatively to this folder."
+        ),
+        required=True,
+    )
+
+
+def add_docker_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the arguments controlling the docker container to `parser`."""
+    parser.add_argument(
+        "--docker_path",
+        help=("FetMRQC docker image to be used."),
+        type=str,
+        default="thsanchez/fetmrqc:latest",
+    )
+    parser.add_argument(
+        "--persistent_container",
+        help=(
+            "Name of a container kept running in the background, in "
+            "which the pipeline is run using docker exec. It is started "
+            "at the first call with the volumes of that call, and can be "
+            "stopped using the stop command."
+        ),
+        type=str,
+        default=None,
+    )
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(
+        description=(
+            "FetMRQC is a quality control tool for fetal brain MRI. "
+        ),
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    subparsers = parser.add_subparsers(
+        help="Pipelines options",
+        dest="command",
+        required=True,
+    )
+
+    # The arguments of the pipelines are only added once the command is
+    # known, so their help is added at the same time.
+    pipeline_parsers = {
+        "reports": subparsers.add_parser(
+            "reports",
+            help="Creates reports for manual quality rating, given a BIDS dataset.",
+            formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+            add_help=False,
+        ),
+        "inference": subparsers.add_parser(
+            "inference",
+            help="Run FetMRQC inference pipeline on a BIDS dataset",
+            formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+            add_help=False,
+        ),
+    }
+
+    batch_parser = subparsers.add_parser(
+        "batch",
+        help=(
+            "Run the reports or inference pipeline on several datasets, "
+            "using a single docker container."
+        ),
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    batch_parser.add_argument(
+        "pipeline",
+        help="Pipeline to be run on each job.",
+        choices=list(PIPELINE_PARSERS),
+    )
+    batch_parser.add_argument(
+        "--manifest",
+        help=(
+            "JSON file containing a list of jobs. Each job is the list of "
+            "arguments that would be passed to the `reports` or `inference` "
+            'command, e.g. ["--bids_dir", "data", "--masks_dir", "masks", '
+            '"--out_dir", "out"].'
+        ),
+        required=True,
+    )
+    add_docker_arguments(batch_parser)
+
+    stop_parser = subparsers.add_parser(
+        "stop",
+        help="Stop a container started with --persistent_container.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    stop_parser.add_argument(
+        "--persistent_container",
+        help="Name of the container to be stopped.",
+        type=str,
+        required=True,
+    )
+
+    # Identify the command before building the parser of its pipeline.
+    command = parser.parse_known_args(argv)[0].command
+    if command in pipeline_parsers:
+        pipeline_parsers[command].add_argument(
+            "-h",
+            "--help",
+            action="help",
+            default=argparse.SUPPRESS,
+            help="show this help message and exit",
+        )
+        build_pipeline_parser(pipeline_parsers[command], command)
+        add_docker_arguments(pipeline_parsers[command])
+
+    args = parser.parse_args(argv)
+
+    if args.command == "stop":
+        stop_persistent_container(args.persistent_container)
+        return
+
+    if args.command == "batch":
+        job_parser = argparse.ArgumentParser(
+            prog=f"{parser.prog} {args.pipeline}"
+        )
+        build_pipeline_parser(job_parser, args.pipeline)
+        with open(args.manifest, "r") as f:
+            jobs = [job_parser.parse_args(job) for job in json.load(f)]
+        for job in jobs:
+            job.command = args.pipeline
+            check_args(job)
+        run_batch(
+            args.pipeline, jobs, args.docker_path, args.persistent_container
+        )
+        return
+
+    check_args(args)
     if args.command == "reports":
         run_reports(args)
     else:
@@ -1,4 +1,4 @@
-from setuptools import setup
+from setuptools import setup, find_packages
 
 
 def install_requires(fname="requirements.txt"):
@@ -11,7 +11,7 @@ def install_requires(fname="requirements.txt"):
 setup(
     name="fetal_brain_qc",
     version="0.1.2",
-    packages=["fetal_brain_qc"],
+    packages=find_packages(include=["fetal_brain_qc", "fetal_brain_qc.*"]),
     description="Quality control for fetal brain MRI",
     author="Thomas Sanchez",
     author_email="thomas.sanchez@unil.ch",
@@ -0,0 +1,71 @@
+"""Test write_csv_row, used to write the IQMs of each run to out_csv."""
+
+import pandas as pd
+from fetal_brain_qc.cli.compute_iqms import write_csv_row
+
+
+def test_write_csv_row_new_file(tmp_path):
+    """Without fieldnames, a new file is created with the row."""
+    out_csv = tmp_path / "iqms.csv"
+    fieldnames = write_csv_row(out_csv, {"name": "a", "im": "a.nii.gz"})
+    assert fieldnames == ["name", "im"]
+    df = pd.read_csv(out_csv)
+    assert df.to_dict(orient="records") == [{"name": "a", "im": "a.nii.gz"}]
+
+
+def test_write_csv_row_append(tmp_path):
+    """When continuing a run, rows are appended to the existing file."""
+    out_csv = tmp_path / "iqms.csv"
+    pd.DataFrame([{"name": "a", "iqm": 1.0}]).to_csv(out_csv, index=False)
+    fieldnames = list(pd.read_csv(out_csv).columns)
+
+    fieldnames = write_csv_row(out_csv, {"name": "b", "iqm": 2.0}, fieldnames)
+    fieldnames = write_csv_row(out_csv, {"name": "c", "iqm": 3.0}, fieldnames)
+    assert fieldnames == ["name", "iqm"]
+    df = pd.read_csv(out_csv)
+    assert list(df["name"]) == ["a", "b", "c"]
+    assert list(df["iqm"]) == [1.0, 2.0, 3.0]
+
+
+def test_write_csv_row_new_column(tmp_path):
+    """A row with a new column rewrites the file with this column, and the
+    previous rows get a missing value."""
+    out_csv = tmp_path / "iqms.csv"
+    fieldnames = write_csv_row(out_csv, {"name": "a", "iqm": 1.0})
+    fieldnames = write_csv_row(
+        out_csv, {"name": "b", "iqm": 2.0, "iqm2": 4.0}, fieldnames
+    )
+    assert fieldnames == ["name", "iqm", "iqm2"]
+    fieldnames = write_csv_row(out_csv, {"name": "c", "iqm": 3.0}, fieldnames)
+
+    df = pd.read_csv(out_csv)
+    assert list(df.columns) == ["name", "iqm", "iqm2"]
+    assert list(df["name"]) == ["a", "b", "c"]
+    assert df["iqm2"].isna().tolist() == [True, False, True]
+    assert df.loc[1, "iqm2"] == 4.0
+
+
+def test_write_csv_row_keeps_values(tmp_path):
+    """Rewriting the file for a new column keeps the previous values as
+    they were written, e.g. zero-padded sessions."""
+    out_csv = tmp_path / "iqms.csv"
+    fieldnames = write_csv_row(out_csv, {"name": "a", "ses": "01"})
+    write_csv_row(out_csv, {"name": "b", "ses": "02", "iqm": 1.0}, fieldnames)
+
+    df = pd.read_csv(out_csv, dtype=str)
+    assert list(df["ses"]) == ["01", "02"]
+
+
+def test_write_csv_row_resume_column_order(tmp_path):
+    """Rows are appended following the column order of the existing file,
+    whatever the position of the name column."""
+    out_csv = tmp_path / "iqms.csv"
+    pd.DataFrame([{"sub": "a", "name": "simu005", "iqm": 1.0}]).to_csv(
+        out_csv, index=False
+    )
+    fieldnames = list(pd.read_csv(out_csv).columns)
+    row = {"name": "simu009", "sub": "b", "iqm": 2.0}
+    write_csv_row(out_csv, row, fieldnames)
+
+    df = pd.read_csv(out_csv)
+    assert df.loc[1].to_dict() == {"sub": "b", "name": "simu009", "iqm": 2.0}
@@ -0,0 +1,32 @@
+"""Test that run_model converts non-numeric IQM columns before inference."""
+
+import numpy as np
+import pandas as pd
+from fetal_brain_qc.cli.inference import run_model
+
+
+class SumModel:
+    """Dummy model predicting the sum of the features, which records the
+    dtypes that it receives."""
+
+    def predict(self, x):
+        self.dtypes = list(x.dtypes)
+        return x.sum(axis=1).to_numpy()
+
+
+def test_run_model_string_columns():
+    """IQM columns read as object or string dtype are converted to float."""
+    df = pd.DataFrame(
+        {
+            "name": ["a", "b"],
+            "iqm1": pd.Series(["1.5", "2"], dtype=object),
+            "iqm2": pd.array(["0.25", "1"], dtype="string"),
+            "iqm3": [1.0, 2.0],
+        }
+    )
+    model = SumModel()
+    pred = run_model(df, model, ["iqm1", "iqm2", "iqm3"], "regression")
+    assert all(dtype == np.float64 for dtype in model.dtypes)
+    assert np.allclose(pred, [2.75, 5.0])
+    pred = run_model(df, model, ["iqm1", "iqm2", "iqm3"], "classification")
+    assert list(pred) == [2, 5]
@@ -0,0 +1,84 @@
+"""Test the normalized cross correlation, and that the mutual information
+metrics, computed from a single joint histogram, match their definition from
+the separate entropies."""
+
+import pytest
+import numpy as np
+from fetal_brain_qc.metrics.utils import (
+    normalized_cross_correlation,
+    shannon_entropy,
+    joint_entropy,
+    mutual_information,
+    normalized_mutual_information,
+)
+
+
+def get_data(seed):
+    """Random pair of correlated float64 images."""
+    rng = np.random.default_rng(seed)
+    x = rng.normal(size=(40, 50, 10))
+    x_ref = 0.7 * x + 0.3 * rng.normal(size=x.shape)
+    return x, x_ref
+
+
+def ncc_reference(x, x_ref):
+    """Normalized cross correlation from the centered data."""
+    ncc = np.sum((x - x.mean()) * (x_ref - x_ref.mean()))
+    return ncc / float(x.size * x.std(ddof=1) * x_ref.std(ddof=1))
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_normalized_cross_correlation(seed):
+    x, x_ref = get_data(seed)
+    assert np.isclose(
+        normalized_cross_correlation(x, x_ref), ncc_reference(x, x_ref)
+    )
+
+
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+@pytest.mark.parametrize(
+    "value, size", [(0.1, 500), (91.39, 33), (782.55, 156), (3.0, 10)]
+)
+def test_normalized_cross_correlation_constant(value, size):
+    """Constant inputs must give the same result as the centered formula,
+    namely nan when the centered data is exactly zero, instead of an
+    arbitrary value caused by cancellation in the raw moments."""
+    x = np.full(size, value)
+    rng = np.random.default_rng(0)
+    for x_ref in [x, rng.normal(size=size)]:
+        ncc = normalized_cross_correlation(x, x_ref)
+        ref = ncc_reference(x, x_ref)
+        assert np.isclose(ncc, ref, equal_nan=True)
+
+
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+def test_normalized_cross_correlation_degenerate():
+    """An exactly constant input has no variance: the NCC is nan."""
+    x_ref = np.random.default_rng(0).normal(size=500)
+    for x in [np.full(500, 3.0), np.full(500, 0.1)]:
+        assert np.isnan(normalized_cross_correlation(x, x_ref))
+        assert np.isnan(normalized_cross_correlation(x, x))
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("bins", [10, 100])
+def test_mutual_information(seed, bins):
+    """MI(X,Y) = H(X) + H(Y) - H(X,Y)"""
+    x, x_ref = get_data(seed)
+    mi = (
+        shannon_entropy(x, bins=bins)
+        + shannon_entropy(x_ref, bins=bins)
+        - joint_entropy(x, x_ref, bins=bins)
+    )
+    assert np.isclose(mutual_information(x, x_ref, bins=bins), mi)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("bins", [10, 100])
+def test_normalized_mutual_information(seed, bins):
+    """NMI(X,Y) = (H(X) + H(Y)) / H(X,Y)"""
+    x, x_ref = get_data(seed)
+    nmi = (
+        shannon_entropy(x, bins=bins) + shannon_entropy(x_ref, bins=bins)
+    ) / joint_entropy(x, x_ref, bins=bins)
+    assert np.isclose(normalized_mutual_information(x, x_ref, bins=bins), nmi)
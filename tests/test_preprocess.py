@@ -0,0 +1,57 @@
+"""Test that crop_input crops the images as
+fetal_brain_utils.get_cropped_stack_based_on_mask."""
+
+import pytest
+import numpy as np
+import nibabel as ni
+from pathlib import Path
+from fetal_brain_utils import get_cropped_stack_based_on_mask
+from fetal_brain_qc.preprocess import crop_input
+
+FILE_DIR = Path(__file__).parent.resolve()
+BIDS_DIR = FILE_DIR / "data"
+MASKS_DIR = FILE_DIR / "data/derivatives/masks"
+
+CASES = [
+    "sub-simu005/ses-01/anat/sub-simu005_ses-01_run-2",
+    "sub-simu005/ses-01/anat/sub-simu005_ses-01_run-6",
+    "sub-simu038/ses-01/anat/sub-simu038_ses-01_run-2",
+]
+
+
+@pytest.mark.parametrize("case", CASES)
+@pytest.mark.parametrize("boundary_mm", [0, 15])
+@pytest.mark.parametrize("mask_image", [True, False])
+def test_crop_input(tmp_path, case, boundary_mm, mask_image):
+    """The cropped image and mask must have the same shape, affine and
+    voxel values as with get_cropped_stack_based_on_mask."""
+    im_path = str(BIDS_DIR / f"{case}_T2w.nii.gz")
+    mask_path = str(MASKS_DIR / f"{case}_mask.nii.gz")
+    out_im, out_mask = crop_input(
+        im_path,
+        mask_path,
+        str(tmp_path),
+        mask_image=mask_image,
+        boundary_mm=boundary_mm,
+    )
+
+    boundaries = dict(
+        boundary_i=boundary_mm, boundary_j=boundary_mm, boundary_k=boundary_mm
+    )
+    ref_im = get_cropped_stack_based_on_mask(
+        ni.load(im_path), ni.load(mask_path), **boundaries
+    )
+    ref_mask = get_cropped_stack_based_on_mask(
+        ni.load(mask_path), ni.load(mask_path), **boundaries
+    )
+    ref_data = ref_im.get_fdata()
+    if mask_image:
+        ref_data = ref_data * ref_mask.get_fdata()
+
+    imc, maskc = ni.load(out_im), ni.load(out_mask)
+    assert imc.shape == ref_im.shape
+    assert maskc.shape == ref_mask.shape
+    assert np.allclose(imc.affine, ref_im.affine)
+    assert np.allclose(maskc.affine, ref_mask.affine)
+    assert np.allclose(imc.get_fdata(), ref_data, rtol=1e-6)
+    assert np.array_equal(maskc.get_fdata(), ref_mask.get_fdata())
@@ -0,0 +1,130 @@
+"""Test the `--manifest` option of the pipelines, and the batch command
+and persistent containers of run_docker.py."""
+
+import json
+import os
+import pytest
+import subprocess
+import sys
+from pathlib import Path
+from fetal_brain_qc.cli.build_run_parsers import get_manifest_jobs
+from fetal_brain_qc.cli import run_reports_pipeline
+
+FILE_DIR = Path(__file__).parent.resolve()
+sys.path.insert(0, str(FILE_DIR.parent))
+import run_docker  # noqa: E402
+
+# Jobs of the reports pipeline, and of the reports command of run_docker.py,
+# where the outputs are given relatively to out_dir.
+JOBS = [
+    ["--bids_dir", "data1", "--masks_dir", "masks1", "--reports_dir", "rep1"],
+    ["--bids_dir", "data2", "--masks_dir", "masks2", "--reports_dir", "rep2"],
+]
+DOCKER_JOBS = [job + ["--out_dir", f"out{i}"] for i, job in enumerate(JOBS)]
+
+
+def write_manifest(tmp_path, jobs):
+    manifest = tmp_path / "manifest.json"
+    with open(manifest, "w") as f:
+        json.dump(jobs, f)
+    return str(manifest)
+
+
+def test_get_manifest_jobs(tmp_path):
+    """The jobs are returned when `--manifest` is given, None otherwise."""
+    manifest = write_manifest(tmp_path, JOBS)
+    assert get_manifest_jobs(["--manifest", manifest]) == JOBS
+    assert get_manifest_jobs(JOBS[0]) is None
+
+
+def test_reports_pipeline_manifest(tmp_path, monkeypatch):
+    """Each job of the manifest runs the full reports pipeline on its
+    own arguments."""
+    cmds = []
+    monkeypatch.setattr(run_reports_pipeline.os, "system", cmds.append)
+    monkeypatch.chdir(tmp_path)
+    run_reports_pipeline.main(["--manifest", write_manifest(tmp_path, JOBS)])
+
+    # Four steps per job: brain extraction, listing, reports and index.
+    assert len(cmds) == 4 * len(JOBS)
+    for i, job in enumerate(JOBS):
+        job_cmds = cmds[4 * i : 4 * (i + 1)]
+        assert job_cmds[0].startswith("qc_brain_extraction")
+        assert f"--bids_dir {job[1]}" in job_cmds[0]
+        assert f"--masks_dir {job[3]}" in job_cmds[0]
+        assert f"--out_dir {job[5]}" in job_cmds[2]
+        assert (tmp_path / job[5]).is_dir()
+
+
+def test_run_docker_batch(tmp_path, monkeypatch):
+    """The batch command parses each job of the manifest with the parser
+    of the chosen pipeline."""
+    calls = []
+    monkeypatch.setattr(
+        run_docker, "run_batch", lambda *args: calls.append(args)
+    )
+    manifest = write_manifest(tmp_path, DOCKER_JOBS)
+    run_docker.main(["batch", "reports", "--manifest", manifest])
+
+    assert len(calls) == 1
+    pipeline, jobs, docker_path, persistent_container = calls[0]
+    assert pipeline == "reports"
+    assert docker_path == "thsanchez/fetmrqc:latest"
+    assert persistent_container is None
+    assert [(j.bids_dir, j.reports_dir, j.out_dir) for j in jobs] == [
+        ("data1", "rep1", "out0"),
+        ("data2", "rep2", "out1"),
+    ]
+    assert all(j.command == "reports" for j in jobs)
+
+
+class FakeDocker:
+    """Records the docker commands and answers docker inspect for a
+    container with the given status and mounts."""
+
+    def __init__(self, status, mounts=()):
+        self.status = status
+        self.mounts = [{"Source": s, "Destination": d} for s, d in mounts]
+        self.cmds = []
+
+    def __call__(self, argv, **kwargs):
+        self.cmds.append(argv)
+        if argv[1] == "inspect":
+            returncode = 1 if self.status is None else 0
+            if "{{json .Mounts}}" in argv:
+                stdout = json.dumps(self.mounts)
+            else:
+                stdout = f"{self.status}\n"
+            return subprocess.CompletedProcess(argv, returncode, stdout, "")
+        return subprocess.CompletedProcess(argv, 0, "", "")
+
+
+def test_persistent_container_symlink(tmp_path, monkeypatch):
+    """A running container is reused when the volumes are given through a
+    symbolic link to the mounted folder."""
+    (tmp_path / "data").mkdir()
+    (tmp_path / "link").symlink_to(tmp_path / "data")
+    docker = FakeDocker("running", [(str(tmp_path / "data"), "/data/data")])
+    monkeypatch.setattr(run_docker.subprocess, "run", docker)
+    run_docker.get_container_status.cache_clear()
+
+    volumes = [(str(tmp_path / "link"), "/data/data")]
+    run_docker.start_persistent_container("fetmrqc", "image", volumes)
+    assert not any(cmd[1] == "run" for cmd in docker.cmds)
+
+    with pytest.raises(ValueError):
+        volumes = [(str(tmp_path / "link"), "/data/out")]
+        run_docker.start_persistent_container("fetmrqc", "image", volumes)
+
+
+def test_persistent_container_stopped(tmp_path, monkeypatch):
+    """A stopped container of the same name is removed before starting a
+    new one."""
+    docker = FakeDocker("exited")
+    monkeypatch.setattr(run_docker.subprocess, "run", docker)
+    run_docker.get_container_status.cache_clear()
+
+    volumes = [(str(tmp_path), "/data/data")]
+    run_docker.start_persistent_container("fetmrqc", "image", volumes)
+    assert [cmd[1] for cmd in docker.cmds] == ["inspect", "rm", "run"]
+    assert f"{os.path.realpath(tmp_path)}:/data/data" in docker.cmds[-1]